@@ -0,0 +1,242 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+from locking import data_lock
+
+# Pfade relativ zum App-Ordner, damit z.B. cron aus einem beliebigen Ordner starten kann.
+BASE_DIR = Path(__file__).resolve().parent
+
+DATA_FILES = [
+    BASE_DIR / "users.json",
+    BASE_DIR / "config.json",
+    BASE_DIR / "materials.json",
+    BASE_DIR / "defekte_verluste.csv",
+    BASE_DIR / "materialwuensche.csv",
+]
+
+# Abgeleitete Dateien werden nicht gesichert und nach einer Wiederherstellung
+# gelöscht, damit die App sie aus den wiederhergestellten Daten neu aufbaut.
+DERIVED_FILES = [BASE_DIR / "valuation.json"]
+
+BACKUP_DIR = BASE_DIR / "backups"
+CHUNKS_DIR = BACKUP_DIR / "chunks"
+SNAPSHOTS_DIR = BACKUP_DIR / "snapshots"
+
+# Chunk-Grenzen liegen am Zeilenende und hängen nur vom Inhalt der Zeile ab;
+# nur Zeilen, die länger als CHUNK_MAX_SIZE sind, werden mittendrin geschnitten.
+# Bei angehängten CSV-Zeilen bleiben so alle bisherigen Chunks unverändert, bei
+# geänderten JSON-Dateien synchronisieren sich die Grenzen nach der Änderung wieder.
+CHUNK_MIN_SIZE = 4 * 1024
+CHUNK_MAX_SIZE = 64 * 1024
+CHUNK_BOUNDARY_MASK = 0x1F
+
+
+def split_chunks(data: bytes) -> list:
+    chunks = []
+    start = 0
+    pos = 0
+    length = len(data)
+    while pos < length:
+        end = data.find(b"\n", pos)
+        end = length if end == -1 else end + 1
+        if end - start > CHUNK_MAX_SIZE:
+            # Überlange Zeile (z.B. Datei ohne Zeilenumbrüche): bei der Maximalgrösse schneiden.
+            pos = start + CHUNK_MAX_SIZE
+            chunks.append(data[start:pos])
+            start = pos
+            continue
+        line = data[pos:end]
+        pos = end
+        size = pos - start
+        if size >= CHUNK_MAX_SIZE or (
+            size >= CHUNK_MIN_SIZE and zlib.crc32(line) & CHUNK_BOUNDARY_MASK == 0
+        ):
+            chunks.append(data[start:pos])
+            start = pos
+    if start < length:
+        chunks.append(data[start:])
+    return chunks
+
+
+def chunk_path(digest: str) -> Path:
+    return CHUNKS_DIR / digest[:2] / digest
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    # Eigene temporäre Datei pro Aufruf, damit sich parallele Läufe nicht stören.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def store_chunk(chunk: bytes) -> tuple:
+    digest = hashlib.sha256(chunk).hexdigest()
+    path = chunk_path(digest)
+    if path.exists():
+        return digest, 0
+    compressed = zlib.compress(chunk, 9)
+    write_atomic(path, compressed)
+    return digest, len(compressed)
+
+
+def read_chunk(digest: str) -> bytes:
+    chunk = zlib.decompress(chunk_path(digest).read_bytes())
+    if hashlib.sha256(chunk).hexdigest() != digest:
+        raise ValueError(f"Chunk {digest} ist beschädigt.")
+    return chunk
+
+
+def create_snapshot() -> dict:
+    # Alle Dateien unter derselben Sperre lesen, damit der Snapshot konsistent ist.
+    with data_lock():
+        contents = {path.name: path.read_bytes() for path in DATA_FILES if path.exists()}
+        missing = [path.name for path in DATA_FILES if path.name not in contents]
+        created_at = datetime.utcnow()
+    if not contents:
+        raise FileNotFoundError(f"Keine Datendateien in {BASE_DIR} gefunden.")
+
+    files = {}
+    new_bytes = 0
+    for name, data in contents.items():
+        digests = []
+        for chunk in split_chunks(data):
+            digest, written = store_chunk(chunk)
+            digests.append(digest)
+            new_bytes += written
+        files[name] = {
+            "size": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "chunks": digests,
+        }
+
+    snapshot_id = created_at.strftime("%Y%m%dT%H%M%S%fZ")
+    snapshot = {
+        "id": snapshot_id,
+        "created_at": created_at.isoformat(),
+        "files": files,
+        "missing": missing,
+        "new_bytes": new_bytes,
+    }
+    write_atomic(
+        SNAPSHOTS_DIR / f"{snapshot_id}.json",
+        json.dumps(snapshot, indent=2).encode("utf-8"),
+    )
+    return snapshot
+
+
+def list_snapshots() -> list:
+    if not SNAPSHOTS_DIR.exists():
+        return []
+    snapshots = []
+    for path in sorted(SNAPSHOTS_DIR.glob("*.json")):
+        with path.open("r", encoding="utf-8") as f:
+            snapshots.append(json.load(f))
+    return snapshots
+
+
+def load_snapshot(snapshot_id: str) -> dict:
+    if snapshot_id == "latest":
+        snapshots = list_snapshots()
+        if not snapshots:
+            raise FileNotFoundError("Es sind noch keine Snapshots vorhanden.")
+        return snapshots[-1]
+    path = SNAPSHOTS_DIR / f"{snapshot_id}.json"
+    if not path.exists():
+        raise FileNotFoundError(f"Snapshot {snapshot_id} existiert nicht.")
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def assemble_file(entry: dict) -> bytes:
+    data = b"".join(read_chunk(digest) for digest in entry["chunks"])
+    if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+        raise ValueError("Wiederhergestellte Datei stimmt nicht mit dem Snapshot überein.")
+    return data
+
+
+def restore_snapshot(snapshot_id: str, file_name: str = None, target_dir: Path = None) -> list:
+    snapshot = load_snapshot(snapshot_id)
+    files = snapshot["files"]
+    # Dateien, die beim Snapshot noch nicht existierten, werden bei einer
+    # vollständigen Wiederherstellung gelöscht (Stand zum Snapshot-Zeitpunkt).
+    missing = snapshot.get("missing", [])
+    if file_name is not None:
+        if file_name not in files:
+            raise FileNotFoundError(f"{file_name} ist nicht im Snapshot {snapshot['id']} enthalten.")
+        files = {file_name: files[file_name]}
+        missing = []
+    elif not files:
+        raise ValueError(f"Snapshot {snapshot['id']} enthält keine Dateien und wird nicht wiederhergestellt.")
+
+    # Erst alle Dateien zusammensetzen und prüfen, dann gemeinsam unter der Sperre schreiben.
+    restored = {name: assemble_file(entry) for name, entry in files.items()}
+    base_dir = target_dir if target_dir is not None else BASE_DIR
+    with data_lock():
+        for name, data in restored.items():
+            write_atomic(base_dir / name, data)
+        for name in missing:
+            (base_dir / name).unlink(missing_ok=True)
+        for path in DERIVED_FILES:
+            (base_dir / path.name).unlink(missing_ok=True)
+    return sorted(restored)
+
+
+def verify_snapshot(snapshot_id: str) -> None:
+    for entry in load_snapshot(snapshot_id)["files"].values():
+        assemble_file(entry)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Backups der Sportbox-Daten")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("create", help="Neuen Snapshot erstellen")
+    subparsers.add_parser("list", help="Vorhandene Snapshots anzeigen")
+
+    restore_parser = subparsers.add_parser("restore", help="Snapshot wiederherstellen")
+    restore_parser.add_argument("snapshot", help="Snapshot-ID oder 'latest'")
+    restore_parser.add_argument("--file", dest="file_name", help="Nur diese Datei wiederherstellen")
+    restore_parser.add_argument("--target", type=Path, help="Zielordner (Standard: Ordner der App)")
+
+    verify_parser = subparsers.add_parser("verify", help="Snapshot auf Vollständigkeit prüfen")
+    verify_parser.add_argument("snapshot", help="Snapshot-ID oder 'latest'")
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "create":
+            snapshot = create_snapshot()
+            print(f"Snapshot {snapshot['id']} erstellt ({snapshot['new_bytes']} neue Bytes).")
+        elif args.command == "list":
+            for snapshot in list_snapshots():
+                total = sum(entry["size"] for entry in snapshot["files"].values())
+                print(f"{snapshot['id']}  {len(snapshot['files'])} Dateien  {total} Bytes")
+        elif args.command == "restore":
+            names = restore_snapshot(args.snapshot, args.file_name, args.target)
+            print(f"Wiederhergestellt: {', '.join(names)}")
+        elif args.command == "verify":
+            verify_snapshot(args.snapshot)
+            print("Snapshot ist vollständig.")
+    except (FileNotFoundError, ValueError, zlib.error) as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import argparse
+import hashlib
+import json
+import random
+import time
+
+from serialization import CODECS, get_codec
+
+CATEGORIES = ["Tischtennis", "Unihockey", "Fussball", "Basketball", "Badminton", "Diverses"]
+UNITS = ["Stück", "Bälle", "Schläger", "Set", "Paar"]
+
+
+def synthetic_users(count: int) -> dict:
+    users = {}
+    for idx in range(count):
+        users[f"user{idx}"] = {
+            "password": hashlib.sha256(str(idx).encode("utf-8")).hexdigest(),
+            "approved": idx % 3 != 0,
+            "is_admin": idx == 0,
+            "full_name": f"Vorname Nachname {idx}",
+            "kontakt": f"user{idx}@example.ch",
+            "created_at": f"2026-02-03T14:{idx % 60:02d}:39.999714",
+            "is_active": idx % 7 != 0,
+        }
+    return {"users": users}
+
+
+def synthetic_materials(count: int) -> list:
+    rng = random.Random(count)
+    prices = [f"{rng.randint(2, 60)}.{rng.choice(['00', '40', '90'])}" for _ in range(count)]
+    return [
+        {
+            "kategorie": rng.choice(CATEGORIES),
+            "name": f"Material {idx} – Grösse {rng.randint(1, 5)}",
+            "marke": rng.choice(["PONGORI", "OROKS", "KIPSTA", "TARMAK"]),
+            "menge": rng.randint(1, 80),
+            "einheit": rng.choice(UNITS),
+            "preis": f"CHF {price}",
+            "waehrung": "CHF",
+            "preis_betrag": price,
+            "details": "Farbe: weiss, " * rng.randint(1, 4),
+            "bild": f"https://contents.mediadecathlon.com/p{idx}/picture.jpg",
+        }
+        for idx, price in enumerate(prices)
+    ]
+
+
+def best_of(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def print_row(name: str, timings: list) -> None:
+    load_users, load_materials, save_users, save_materials = (t * 1000 for t in timings)
+    print(
+        f"{name:<10}{load_users:>12.1f}ms{load_materials:>14.1f}ms"
+        f"{save_users:>12.1f}ms{save_materials:>14.1f}ms"
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Vergleicht die JSON-Codecs auf synthetischen Daten")
+    parser.add_argument("--users", type=int, default=20000, help="Anzahl Nutzer")
+    parser.add_argument("--materials", type=int, default=20000, help="Anzahl Materialeinträge")
+    parser.add_argument("--repeat", type=int, default=5, help="Wiederholungen pro Messung")
+    args = parser.parse_args(argv)
+
+    reference = get_codec("json")
+    users_raw = reference.encode(synthetic_users(args.users))
+    materials_raw = reference.encode(synthetic_materials(args.materials))
+    print(f"users.json: {len(users_raw) / 1e6:.1f} MB, materials.json: {len(materials_raw) / 1e6:.1f} MB")
+    print(f"{'codec':<10}{'load users':>14}{'load material':>16}{'save users':>14}{'save material':>16}")
+
+    # Bisheriger Stand ohne Codec-Schicht: json.loads und json.dumps(indent=2).
+    users = json.loads(users_raw)
+    materials = json.loads(materials_raw)
+    timings = [
+        best_of(lambda: json.loads(users_raw), args.repeat),
+        best_of(lambda: json.loads(materials_raw), args.repeat),
+        best_of(lambda: json.dumps(users, indent=2), args.repeat),
+        best_of(lambda: json.dumps(materials, indent=2, ensure_ascii=False), args.repeat),
+    ]
+    print_row("baseline", timings)
+
+    for name in CODECS:
+        codec = get_codec(name)
+        users = codec.decode(users_raw)
+        materials = codec.decode_materials(materials_raw)
+        timings = [
+            best_of(lambda: codec.decode(users_raw), args.repeat),
+            best_of(lambda: codec.decode_materials(materials_raw), args.repeat),
+            best_of(lambda: codec.encode(users), args.repeat),
+            best_of(lambda: codec.encode(materials), args.repeat),
+        ]
+        print_row(name, timings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import fcntl
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+LOCK_FILE = Path(__file__).resolve().parent / ".data.lock"
+
+_held = threading.local()
+
+
+@contextmanager
+def data_lock():
+    # Prozessübergreifende Sperre für alle Schreibzugriffe auf die Datendateien,
+    # damit Backups einen konsistenten Stand aller Dateien sehen. Hält der Thread
+    # die Sperre bereits, wird sie nicht erneut angefordert.
+    if getattr(_held, "depth", 0):
+        _held.depth += 1
+        try:
+            yield
+        finally:
+            _held.depth -= 1
+        return
+    with LOCK_FILE.open("a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        _held.depth = 1
+        try:
+            yield
+        finally:
+            _held.depth = 0
+            fcntl.flock(handle, fcntl.LOCK_UN)
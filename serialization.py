@@ -0,0 +1,136 @@
+import json
+import os
+from typing import TypedDict, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Schema der Materialeinträge: Feldname -> (Typ, Standardwert). Typisiert
+# dekodiert wird nur mit msgspec, die anderen Codecs ergänzen nur die Standardwerte.
+# Nutzer werden ungeprüft dekodiert, damit unbekannte Felder erhalten bleiben;
+# fehlende Felder ergänzt ensure_user_defaults.
+MATERIAL_FIELDS = {
+    "kategorie": (str, ""),
+    "name": (str, ""),
+    "marke": (str, ""),
+    "menge": (Union[int, float, str], ""),
+    "einheit": (str, ""),
+    "preis": (str, ""),
+    "waehrung": (str, ""),
+    "preis_betrag": (str, ""),
+    "details": (str, ""),
+    "bild": (str, ""),
+}
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def normalize_materials(data) -> list:
+    # Tolerante Variante ohne Typprüfung: fehlende Felder ergänzen,
+    # unbekannte Felder und Einträge, die keine Objekte sind, weglassen.
+    if not isinstance(data, list):
+        return []
+    defaults = [(name, default) for name, (_, default) in MATERIAL_FIELDS.items()]
+    expected = MATERIAL_FIELDS.keys()
+    return [
+        # Vollständige Einträge unverändert übernehmen, nur die übrigen neu aufbauen.
+        item if item.keys() == expected else {name: item.get(name, default) for name, default in defaults}
+        for item in data
+        if isinstance(item, dict)
+    ]
+
+
+class StdlibCodec:
+    name = "json"
+
+    def encode(self, obj) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+    def decode(self, data: bytes):
+        try:
+            return json.loads(data)
+        except ValueError as exc:
+            raise SchemaError(str(exc)) from exc
+
+    # Ohne msgspec wird nicht typisiert dekodiert: eine zusätzliche Prüfung in
+    # Python wäre langsamer als das Parsen selbst.
+    def decode_materials(self, data: bytes) -> list:
+        return normalize_materials(self.decode(data))
+
+
+class OrjsonCodec(StdlibCodec):
+    name = "orjson"
+
+    def encode(self, obj) -> bytes:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        except TypeError:
+            # orjson kann z.B. keine Ganzzahlen über 64 Bit schreiben.
+            return super().encode(obj)
+
+    def decode(self, data: bytes):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError as exc:
+            raise SchemaError(str(exc)) from exc
+
+
+class MsgspecCodec(StdlibCodec):
+    name = "msgspec"
+
+    def __init__(self):
+        # Als TypedDict dekodiert msgspec direkt in dicts und prüft die Typen im
+        # selben Durchgang; fehlende Felder ergänzt normalize_materials.
+        material = TypedDict(
+            "Material",
+            {name: field_type for name, (field_type, _) in MATERIAL_FIELDS.items()},
+            total=False,
+        )
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+        self._materials_decoder = msgspec.json.Decoder(list[material])
+
+    def encode(self, obj) -> bytes:
+        return msgspec.json.format(self._encoder.encode(obj), indent=2)
+
+    def decode(self, data: bytes):
+        try:
+            return self._decoder.decode(data)
+        except msgspec.DecodeError as exc:
+            raise SchemaError(str(exc)) from exc
+
+    def decode_materials(self, data: bytes) -> list:
+        try:
+            return normalize_materials(self._materials_decoder.decode(data))
+        except msgspec.DecodeError as exc:
+            raise SchemaError(str(exc)) from exc
+
+
+CODECS = {StdlibCodec.name: StdlibCodec}
+if orjson is not None:
+    CODECS[OrjsonCodec.name] = OrjsonCodec
+if msgspec is not None:
+    CODECS[MsgspecCodec.name] = MsgspecCodec
+
+
+def get_codec(name: str = None):
+    # Ohne Angabe den schnellsten installierten Codec wählen (laut bench_codecs.py
+    # orjson vor msgspec), SPORTBOX_JSON_CODEC erzwingt einen bestimmten.
+    name = name or os.environ.get("SPORTBOX_JSON_CODEC")
+    if name is None:
+        for candidate in ("orjson", "msgspec", "json"):
+            if candidate in CODECS:
+                name = candidate
+                break
+    if name not in CODECS:
+        raise ValueError(f"Unbekannter oder nicht installierter Codec: {name}")
+    return CODECS[name]()
@@ -2,15 +2,34 @@ import streamlit as st
 import pandas as pd
 from datetime import date, datetime
 from pathlib import Path
-import json
 import hashlib
 import csv
+import io
+import logging
+
+from locking import data_lock
+from serialization import SchemaError, get_codec, normalize_materials
+from valuation import (
+    apply_defect_rows,
+    empty_valuation,
+    format_amounts,
+    material_price,
+    normalize_material,
+    parse_quantity,
+    sum_amounts,
+    update_material_totals,
+)
 
 USERS_FILE = Path("users.json")
 CONFIG_FILE = Path("config.json")
 DEFECTS_FILE = Path("defekte_verluste.csv")
 WISHES_FILE = Path("materialwuensche.csv")
 MATERIALS_FILE = Path("materials.json")
+VALUATION_FILE = Path("valuation.json")
+
+CODEC = get_codec()
+
+logger = logging.getLogger(__name__)
 
 ADMIN_PLACEHOLDER = "CHANGE_ME_ADMIN"
 ADMIN_DEFAULT_PASSWORD = "test123"  # nach Deployment ändern
@@ -67,27 +86,29 @@ def ensure_user_defaults(data: dict) -> bool:
     return changed
 
 
+def create_data_file(path: Path, data) -> None:
+    with data_lock():
+        if not path.exists():
+            path.write_bytes(CODEC.encode(data))
+
+
 def load_users() -> dict:
     if not USERS_FILE.exists():
-        USERS_FILE.write_text(
-            json.dumps(
-                {
-                    "users": {
-                        "admin": {
-                            "password": hash_password(ADMIN_DEFAULT_PASSWORD),
-                            "approved": True,
-                            "is_admin": True,
-                            "full_name": "Administrator",
-                            "kontakt": ""
-                        }
+        create_data_file(
+            USERS_FILE,
+            {
+                "users": {
+                    "admin": {
+                        "password": hash_password(ADMIN_DEFAULT_PASSWORD),
+                        "approved": True,
+                        "is_admin": True,
+                        "full_name": "Administrator",
+                        "kontakt": ""
                     }
-                },
-                indent=2,
-            ),
-            encoding="utf-8",
+                }
+            },
         )
-    with USERS_FILE.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = CODEC.decode(USERS_FILE.read_bytes())
     changed = ensure_admin_user(data)
     if ensure_user_defaults(data):
         changed = True
@@ -97,57 +118,113 @@ def load_users() -> dict:
 
 
 def save_users(data: dict) -> None:
-    with USERS_FILE.open("w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    with data_lock():
+        USERS_FILE.write_bytes(CODEC.encode(data))
 
 
 def load_config() -> dict:
     if not CONFIG_FILE.exists():
-        CONFIG_FILE.write_text(
-            json.dumps({"current_code": "0000"}, indent=2),
-            encoding="utf-8",
-        )
-    with CONFIG_FILE.open("r", encoding="utf-8") as f:
-        return json.load(f)
+        create_data_file(CONFIG_FILE, {"current_code": "0000"})
+    return CODEC.decode(CONFIG_FILE.read_bytes())
 
 
 def save_config(data: dict) -> None:
-    with CONFIG_FILE.open("w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    with data_lock():
+        CONFIG_FILE.write_bytes(CODEC.encode(data))
 
 
 def load_materials() -> list:
     if not MATERIALS_FILE.exists():
-        MATERIALS_FILE.write_text(
-            json.dumps([], indent=2, ensure_ascii=False),
-            encoding="utf-8",
-        )
-    with MATERIALS_FILE.open("r", encoding="utf-8") as f:
-        materials = json.load(f)
-    if not isinstance(materials, list):
-        materials = []
-    normalized = []
-    for item in materials:
-        if not isinstance(item, dict):
-            continue
-        normalized.append(
-            {
-                "kategorie": item.get("kategorie", ""),
-                "name": item.get("name", ""),
-                "marke": item.get("marke", ""),
-                "menge": item.get("menge", ""),
-                "einheit": item.get("einheit", ""),
-                "preis": item.get("preis", ""),
-                "details": item.get("details", ""),
-                "bild": item.get("bild", ""),
-            }
-        )
-    return normalized
+        create_data_file(MATERIALS_FILE, [])
+    return decode_materials(MATERIALS_FILE.read_bytes())
+
+
+def decode_materials(raw: bytes) -> list:
+    try:
+        return CODEC.decode_materials(raw)
+    except SchemaError as exc:
+        # Datei entspricht nicht dem Schema: melden und die Einträge ungeprüft übernehmen.
+        logger.warning("%s entspricht nicht dem Schema: %s", MATERIALS_FILE, exc)
+        return normalize_materials(CODEC.decode(raw))
 
 
 def save_materials(materials: list) -> None:
-    with MATERIALS_FILE.open("w", encoding="utf-8") as f:
-        json.dump(materials, f, indent=2, ensure_ascii=False)
+    materials = [normalize_material(item) for item in materials]
+    raw = CODEC.encode(materials)
+    with data_lock():
+        MATERIALS_FILE.write_bytes(raw)
+        valuation = read_valuation()
+        update_material_totals(valuation, materials, hashlib.sha256(raw).hexdigest())
+        valuation["materials_stat"] = file_stat(MATERIALS_FILE)
+        VALUATION_FILE.write_bytes(CODEC.encode(valuation))
+
+
+def read_valuation() -> dict:
+    if not VALUATION_FILE.exists():
+        return empty_valuation()
+    try:
+        valuation = CODEC.decode(VALUATION_FILE.read_bytes())
+    except SchemaError:
+        return empty_valuation()
+    if not isinstance(valuation, dict) or valuation.keys() != empty_valuation().keys():
+        return empty_valuation()
+    return valuation
+
+
+def read_defect_rows(data: bytes, offset: int) -> list:
+    header_end = data.find(b"\n") + 1 or len(data)
+    fieldnames = next(csv.reader([data[:header_end].decode("utf-8")]), [])
+    tail = data[max(offset, header_end):]
+    return list(csv.DictReader(io.StringIO(tail.decode("utf-8"), newline=""), fieldnames=fieldnames))
+
+
+def file_stat(path: Path) -> list:
+    # Grösse und Änderungszeit; sind beide unverändert, wird die Datei nicht neu gelesen.
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return [0, 0]
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_valuation() -> dict:
+    # Kategoriesummen werden nur bei geänderter Materialliste neu berechnet,
+    # neue Defekt-/Verlustmeldungen werden ab der zuletzt gelesenen Stelle addiert.
+    # Unveränderte Dateien (gleiche Grösse und Änderungszeit) werden weder gelesen noch gehasht.
+    with data_lock():
+        valuation = read_valuation()
+        changed = False
+        defects = None
+        defects_stat = file_stat(DEFECTS_FILE)
+        if defects_stat != valuation["defects_stat"]:
+            defects = DEFECTS_FILE.read_bytes() if DEFECTS_FILE.exists() else b""
+            offset = valuation["defects_offset"]
+            # Der Hash der bereits gelesenen Bytes wird für die ganze Datei weitergeführt.
+            defects_hash = hashlib.sha256(memoryview(defects)[:offset])
+            # Bereits gelesene Meldungen wurden geändert oder gelöscht: alles neu aufbauen.
+            if offset and (len(defects) < offset or defects_hash.hexdigest() != valuation["defects_sha256"]):
+                valuation = empty_valuation()
+                defects_hash = hashlib.sha256()
+        materials_stat = file_stat(MATERIALS_FILE)
+        if not valuation["materials_sha256"] or materials_stat != valuation["materials_stat"]:
+            materials_raw = MATERIALS_FILE.read_bytes() if MATERIALS_FILE.exists() else b""
+            materials_sha256 = hashlib.sha256(materials_raw).hexdigest()
+            if valuation["materials_sha256"] != materials_sha256:
+                materials = decode_materials(materials_raw) if materials_raw else []
+                update_material_totals(valuation, materials, materials_sha256)
+            valuation["materials_stat"] = materials_stat
+            changed = True
+        if defects is not None:
+            offset = valuation["defects_offset"]
+            if len(defects) > offset:
+                rows = read_defect_rows(defects, offset)
+                defects_hash.update(memoryview(defects)[offset:])
+                apply_defect_rows(valuation, rows, len(defects), defects_hash.hexdigest())
+            valuation["defects_stat"] = defects_stat
+            changed = True
+        if changed:
+            VALUATION_FILE.write_bytes(CODEC.encode(valuation))
+    return valuation
 
 
 def material_options(materials: list) -> list:
@@ -189,12 +266,13 @@ def register_user(username: str, password: str, full_name: str, kontakt: str):
 
 
 def append_row_to_csv(path: Path, fieldnames, row: dict):
-    file_exists = path.exists()
-    with path.open("a", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(row)
+    with data_lock():
+        file_exists = path.exists()
+        with path.open("a", newline="", encoding="utf-8") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            if not file_exists:
+                writer.writeheader()
+            writer.writerow(row)
 
 
 st.set_page_config(
@@ -350,6 +428,64 @@ with tab_material:
     st.subheader("Aktuelle Ausstattung der Sportbox")
     items = load_materials()
 
+    categories = sorted({item["kategorie"] for item in items if item["kategorie"]})
+    prices = [material_price(item) for item in items]
+    currencies = sorted({currency for currency, amount in prices if amount is not None})
+    col_filter, col_price, col_sort = st.columns([2, 2, 1])
+    with col_filter:
+        selected_categories = st.multiselect("Kategorie", categories)
+    with col_price:
+        price_currency = currencies[0] if len(currencies) == 1 else None
+        if len(currencies) > 1:
+            selected_currency = st.selectbox("Währung", ["Alle"] + currencies)
+            price_currency = None if selected_currency == "Alle" else selected_currency
+        amounts = [
+            float(amount) for currency, amount in prices
+            if amount is not None and currency == price_currency
+        ]
+        price_range = None
+        if amounts and min(amounts) < max(amounts):
+            price_range = st.slider(
+                f"Preis ({price_currency})",
+                min_value=min(amounts),
+                max_value=max(amounts),
+                value=(min(amounts), max(amounts)),
+            )
+    with col_sort:
+        sort_order = st.selectbox(
+            "Sortieren nach",
+            ["Kategorie", "Name", "Preis aufsteigend", "Preis absteigend", "Menge"],
+        )
+
+    entries = list(zip(items, prices))
+    if selected_categories:
+        entries = [entry for entry in entries if entry[0]["kategorie"] in selected_categories]
+    # Mit gewählter Währung nur Material mit Preis in dieser Währung und im Preisbereich zeigen;
+    # ohne Einschränkung des Bereichs bleibt auch Material ohne Preis sichtbar.
+    price_filtered = price_currency is not None and (
+        len(currencies) > 1 or (price_range is not None and price_range != (min(amounts), max(amounts)))
+    )
+    if price_filtered:
+        low, high = price_range if price_range is not None else (float("-inf"), float("inf"))
+        entries = [
+            (item, (currency, amount)) for item, (currency, amount) in entries
+            if amount is not None and currency == price_currency and low <= float(amount) <= high
+        ]
+    if sort_order == "Name":
+        entries.sort(key=lambda entry: entry[0]["name"].lower())
+    elif sort_order in ("Preis aufsteigend", "Preis absteigend"):
+        # Beträge nur innerhalb derselben Währung vergleichen.
+        priced = [entry for entry in entries if entry[1][1] is not None]
+        unpriced = [entry for entry in entries if entry[1][1] is None]
+        if sort_order == "Preis aufsteigend":
+            priced.sort(key=lambda entry: (entry[1][0], entry[1][1]))
+        else:
+            priced.sort(key=lambda entry: (entry[1][0], -entry[1][1]))
+        entries = priced + unpriced
+    elif sort_order == "Menge":
+        entries.sort(key=lambda entry: parse_quantity(entry[0]["menge"]) or 0, reverse=True)
+    items = [item for item, _ in entries]
+
     cols = st.columns(3)
     for idx, item in enumerate(items):
         col = cols[idx % 3]
@@ -633,19 +769,28 @@ if is_admin:
             "menge",
             "einheit",
             "preis",
+            "waehrung",
+            "preis_betrag",
             "details",
             "bild",
         ]
+        # Werden beim Speichern aus "preis" berechnet und sind nur zur Kontrolle sichtbar.
+        price_columns = ["waehrung", "preis_betrag"]
         if df_materials.empty:
             df_materials = pd.DataFrame(columns=material_columns)
         else:
             df_materials = df_materials.reindex(columns=material_columns)
 
         with st.form("materials_form"):
+            st.caption(
+                "Währung und Betrag werden beim Speichern aus dem Preis gelesen. "
+                "Ist der Betrag leer, konnte der Preis nicht eindeutig erkannt werden."
+            )
             edited_materials = st.data_editor(
                 df_materials,
                 num_rows="dynamic",
                 use_container_width=True,
+                disabled=price_columns,
             )
             save_materials_btn = st.form_submit_button("Material speichern")
 
@@ -661,7 +806,7 @@ if is_admin:
                         value = ""
                     if isinstance(value, str):
                         value = value.strip()
-                    if value != "":
+                    if value != "" and col not in price_columns:
                         empty_row = False
                     cleaned_row[col] = value
                 if empty_row:
@@ -676,6 +821,39 @@ if is_admin:
                 cleaned.append(cleaned_row)
             save_materials(cleaned)
             st.success("Material gespeichert.")
+
+        st.divider()
+        st.markdown("### Budget")
+        valuation = load_valuation()
+        budget_categories = valuation["categories"]
+        if not budget_categories:
+            st.info("Noch kein Material erfasst.")
+        else:
+            budget_rows = [
+                {
+                    "Kategorie": kategorie,
+                    "Artikel": entry["items"],
+                    "Menge": entry["quantity"],
+                    "Wiederbeschaffungswert": format_amounts(entry["value"]),
+                    "Verlust (Defekte / Verluste)": format_amounts(entry["lost_value"]),
+                }
+                for kategorie, entry in sorted(budget_categories.items())
+            ]
+            budget_rows.append(
+                {
+                    "Kategorie": "Total",
+                    "Artikel": sum(entry["items"] for entry in budget_categories.values()),
+                    "Menge": sum(entry["quantity"] for entry in budget_categories.values()),
+                    "Wiederbeschaffungswert": format_amounts(
+                        sum_amounts(entry["value"] for entry in budget_categories.values())
+                    ),
+                    "Verlust (Defekte / Verluste)": format_amounts(
+                        sum_amounts(entry["lost_value"] for entry in budget_categories.values())
+                    ),
+                }
+            )
+            st.dataframe(pd.DataFrame(budget_rows), use_container_width=True, hide_index=True)
+
         st.divider()
         st.markdown("### Defekte / Verluste")
         if DEFECTS_FILE.exists():
@@ -0,0 +1,211 @@
+import re
+from decimal import Decimal, InvalidOperation
+
+DEFAULT_CURRENCY = "CHF"
+CENT = Decimal("0.01")
+
+CURRENCY_ALIASES = {
+    "CHF": "CHF",
+    "SFR": "CHF",
+    "FR": "CHF",
+    "EUR": "EUR",
+    "€": "EUR",
+    "USD": "USD",
+    "$": "USD",
+}
+
+CURRENCY_PATTERN = re.compile(r"(?<![A-Z])(CHF|SFR\.?|FR\.?|EUR|USD)(?![A-Z])|(€|\$)", re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r"-?\d[\d'’]*(?:[.,]\d+)*(?:\.[-–]+)?")
+SEPARATOR_PATTERN = re.compile(r"[.,]")
+RANGE_AFTER_PATTERN = re.compile(r"\s*(?:-|–|bis)\s*\d", re.IGNORECASE)
+RANGE_BEFORE_PATTERN = re.compile(r"\d\s*(?:-|–|bis)\s*$", re.IGNORECASE)
+
+
+def parse_amount(text: str):
+    # "1'234.50", "1.234,50", "1,234.50", "21.-" -> Decimal; mehrdeutig -> None.
+    # Nur das letzte Trennzeichen mit 1-2 folgenden Ziffern ist ein Dezimalpunkt,
+    # alle anderen müssen Tausendertrennzeichen vor genau drei Ziffern sein.
+    if text.startswith("-"):
+        return None
+    text = re.sub(r"\.[-–]+$", "", text).rstrip(".,")
+    text = re.sub(r"['’]", "", text)
+    separators = list(SEPARATOR_PATTERN.finditer(text))
+    decimals = ""
+    if separators and 1 <= len(text) - separators[-1].end() <= 2:
+        decimal_separator = separators.pop()
+        decimals = text[decimal_separator.end():]
+        text = text[:decimal_separator.start()]
+        if any(separator.group(0) == decimal_separator.group(0) for separator in separators):
+            return None
+    groups = SEPARATOR_PATTERN.split(text)
+    if len({separator.group(0) for separator in separators}) > 1:
+        return None
+    if not groups[0] or any(len(group) != 3 for group in groups[1:]):
+        return None
+    try:
+        return Decimal("".join(groups) + ("." + decimals if decimals else "")).quantize(CENT)
+    except InvalidOperation:
+        return None
+
+
+def parse_price(value) -> tuple:
+    # "CHF 21.90", "21,90 Fr.", "ca. 2x CHF 10" -> ("CHF", Decimal(...)).
+    # Lässt sich der Betrag nicht eindeutig bestimmen, wird ("", None) geliefert.
+    if isinstance(value, bool) or value is None:
+        return "", None
+    if isinstance(value, (int, float)):
+        amount = Decimal(str(value))
+        if not amount.is_finite() or amount < 0:
+            return "", None
+        try:
+            return DEFAULT_CURRENCY, amount.quantize(CENT)
+        except InvalidOperation:
+            return "", None
+    text = str(value).strip()
+    numbers = list(NUMBER_PATTERN.finditer(text))
+    currency_match = CURRENCY_PATTERN.search(text)
+    if currency_match:
+        token = (currency_match.group(1) or currency_match.group(2)).upper().rstrip(".")
+        currency = CURRENCY_ALIASES[token]
+        # Bevorzugt die Zahl direkt nach der Währung, sonst die direkt davor.
+        after = [
+            n for n in numbers
+            if n.start() >= currency_match.end() and not text[currency_match.end():n.start()].strip()
+        ]
+        before = [
+            n for n in numbers
+            if n.end() <= currency_match.start() and not text[n.end():currency_match.start()].strip()
+        ]
+        candidates = after or before
+    else:
+        currency = DEFAULT_CURRENCY
+        candidates = numbers
+    if len(candidates) != 1:
+        return "", None
+    # Preisspannen wie "CHF 10 - 20" oder "10 bis 20 Fr." sind mehrdeutig.
+    candidate = candidates[0]
+    if RANGE_AFTER_PATTERN.match(text, candidate.end()) or RANGE_BEFORE_PATTERN.search(
+        text[:candidate.start()]
+    ):
+        return "", None
+    amount = parse_amount(candidate.group(0))
+    if amount is None:
+        return "", None
+    return currency, amount
+
+
+def parse_quantity(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        quantity = int(float(value))
+    except (ValueError, TypeError, OverflowError):
+        return None
+    return quantity if quantity >= 0 else None
+
+
+def normalize_material(item: dict) -> dict:
+    currency, amount = parse_price(item.get("preis", ""))
+    normalized = dict(item)
+    normalized["waehrung"] = currency
+    normalized["preis_betrag"] = "" if amount is None else str(amount)
+    return normalized
+
+
+def material_price(item: dict) -> tuple:
+    if item.get("preis_betrag", "") != "":
+        try:
+            amount = Decimal(item["preis_betrag"])
+        except (InvalidOperation, TypeError):
+            amount = None
+        if amount is not None and amount.is_finite():
+            return item.get("waehrung", "") or DEFAULT_CURRENCY, amount
+    return parse_price(item.get("preis", ""))
+
+
+def format_amounts(amounts: dict) -> str:
+    if not amounts:
+        return "-"
+    return ", ".join(
+        f"{currency} {Decimal(amount).quantize(CENT)}" for currency, amount in sorted(amounts.items())
+    )
+
+
+def _add_amount(amounts: dict, currency: str, amount: Decimal) -> None:
+    # Ungerundet speichern, damit sich anteilige Verluste nicht verfälschen;
+    # gerundet wird erst in format_amounts.
+    amounts[currency] = str(Decimal(amounts.get(currency, "0")) + amount)
+
+
+def sum_amounts(amount_dicts) -> dict:
+    totals = {}
+    for amounts in amount_dicts:
+        for currency, amount in amounts.items():
+            _add_amount(totals, currency, Decimal(amount))
+    return totals
+
+
+def empty_valuation() -> dict:
+    return {
+        "materials_sha256": "",
+        "materials_stat": [0, 0],
+        "defects_offset": 0,
+        "defects_stat": [0, 0],
+        "defects_sha256": "",
+        "lost_quantities": {},
+        "price_index": {},
+        "categories": {},
+    }
+
+
+def update_material_totals(valuation: dict, materials: list, materials_sha256: str) -> None:
+    # Preisliste oder Bestand hat sich geändert: Kategoriesummen neu aufbauen und
+    # die bisher gemeldeten Verluste mit den aktuellen Preisen bewerten. Der Preis
+    # gilt für die ganze erfasste Menge, ein Verlust kostet anteilig Preis / Menge.
+    categories = {}
+    price_index = {}
+    for item in materials:
+        kategorie = item.get("kategorie", "") or "Ohne Kategorie"
+        entry = categories.setdefault(
+            kategorie,
+            {"items": 0, "quantity": 0, "value": {}, "lost_value": {}},
+        )
+        entry["items"] += 1
+        quantity = parse_quantity(item.get("menge", ""))
+        if quantity is not None:
+            entry["quantity"] += quantity
+        currency, amount = material_price(item)
+        if amount is None:
+            continue
+        _add_amount(entry["value"], currency, amount)
+        name = item.get("name", "").strip()
+        if name and name not in price_index:
+            price_index[name] = [kategorie, currency, str(amount), quantity or 1]
+
+    valuation["categories"] = categories
+    valuation["price_index"] = price_index
+    valuation["materials_sha256"] = materials_sha256
+    for name, quantity in valuation["lost_quantities"].items():
+        _add_loss(valuation, name, quantity)
+
+
+def _add_loss(valuation: dict, name: str, quantity: int) -> None:
+    indexed = valuation["price_index"].get(name)
+    if indexed is None:
+        return
+    kategorie, currency, amount, pack_quantity = indexed
+    lost_value = valuation["categories"][kategorie]["lost_value"]
+    _add_amount(lost_value, currency, Decimal(amount) * quantity / pack_quantity)
+
+
+def apply_defect_rows(valuation: dict, rows, defects_offset: int, defects_sha256: str) -> None:
+    lost_quantities = valuation["lost_quantities"]
+    for row in rows:
+        name = (row.get("material") or "").strip()
+        quantity = parse_quantity(row.get("anzahl", ""))
+        if not name or not quantity:
+            continue
+        lost_quantities[name] = lost_quantities.get(name, 0) + quantity
+        _add_loss(valuation, name, quantity)
+    valuation["defects_offset"] = defects_offset
+    valuation["defects_sha256"] = defects_sha256